@@ -1,15 +1,80 @@
+import io
+import os
 import json
+import shutil
 import zipfile
 import tempfile
-import base64
+import threading
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import quote
 
 import streamlit as st
 
+try:
+    import orjson  # optional: fast C JSON parser
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson  # optional: used when orjson is missing, builds only the keys the viewer reads
+except ImportError:
+    simdjson = None
+
+try:
+    import pybase64 as base64  # optional: SIMD base64 encoder, same API
+except ImportError:
+    import base64
+
+try:
+    import ijson  # optional: incremental parsing of large messages.json
+except ImportError:
+    ijson = None
+
+try:
+    from PIL import Image, ImageOps  # optional: thumbnails of large images
+except ImportError:
+    Image = ImageOps = None
+
 
 # ============= SETTINGS =============
 MAX_UPLOAD_SIZE = 200 * 1024 * 1024  # 200 MB limit for Streamlit Cloud
+STREAM_PARSE_MIN_SIZE = 64 * 1024 * 1024  # stream-parse messages.json above this
+
+# Extracted ZIP exports live under ./static so Streamlit can serve the
+# attachments over HTTP (needs server.enableStaticServing, see .streamlit/).
+STATIC_DIR = Path(__file__).parent / "static"
+STATIC_URL = "app/static"
+INLINE_MAX_SIZE = 16 * 1024  # images smaller than this are inlined as data URIs
+FINGERPRINT_CHUNK = 64 * 1024  # bytes hashed from each end of an upload
+COPY_BUFFER_SIZE = 1024 * 1024  # buffer size when extracting ZIP members
+THUMBNAIL_SIZE = 520  # px, 2x the 260px preview box for HiDPI screens
+THUMBNAIL_QUALITY = 80  # WebP quality of image thumbnails
+THUMBNAIL_TYPES = ("image/jpeg", "image/png", "image/webp")  # not GIF: keep animation
+THUMBNAIL_MAX_PIXELS = 40_000_000  # larger images get no thumbnail (~160 MB decoded)
+# Each worker holds one fully decoded image, so keep this small on 1 GB hosts
+PREVIEW_WORKERS = min(4, os.cpu_count() or 1)
+PAGE_SIZE = 200  # messages rendered per page, page 1 = most recent
+CACHE_TTL = 60 * 60  # seconds an upload stays in the in-memory caches
+CACHE_MAX_UPLOADS = 2  # uploads (up to 200 MB each) kept in memory across sessions
+STATIC_EXPORT_TTL = 2 * CACHE_TTL  # idle seconds before an extracted export is deleted
+
+# Only these attachments are ever written to (and served from) app/static.
+# Streamlit picks the Content-Type from the extension, so the extension must
+# be a plain image/video type and match what messages.json declares.
+STATIC_MEDIA_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".mp4": "video/mp4",
+    ".webm": "video/webm",
+    ".mov": "video/quicktime",
+}
 
 
 # ============= BASIC HELPERS =============
@@ -23,6 +88,27 @@ def parse_ts(ts: str | None):
         return None
 
 
+def format_ts(ts: str | None) -> str:
+    """
+    Format an ISO timestamp for display as "YYYY-MM-DD HH:MM AM/PM".
+
+    Discord timestamps have a fixed shape (YYYY-MM-DDTHH:MM:SS...), so the
+    display string is sliced straight out of the input; anything else goes
+    through parse_ts. Non-string values show no timestamp.
+    """
+    if not isinstance(ts, str):
+        return ""
+    hh_mm = ts[11:13] + ts[14:16]
+    if len(ts) >= 19 and ts[10] == "T" and hh_mm.isascii() and hh_mm.isdigit():
+        hour = int(hh_mm[:2])
+        suffix = "AM" if hour < 12 else "PM"
+        return f"{ts[:10]} {hour % 12 or 12:02d}:{hh_mm[2:]} {suffix}"
+
+    dt = parse_ts(ts)
+    # 12-hour format with AM/PM
+    return dt.strftime("%Y-%m-%d %I:%M %p") if dt else ""
+
+
 def html_escape(text: str) -> str:
     """Escape text so it is safe in HTML, keep line breaks."""
     if text is None:
@@ -37,133 +123,533 @@ def html_escape(text: str) -> str:
     )
 
 
+def upload_fingerprint(uploaded, full: bool = False) -> str:
+    """
+    Return a fingerprint of an uploaded file.
+
+    By default hashes the size plus the first and last FINGERPRINT_CHUNK
+    bytes, so it can be recomputed on every rerun; for a ZIP the tail holds
+    the central directory with every member's CRC. Pass full=True to hash
+    the whole upload (messages.json, where a same-length edit can leave both
+    ends unchanged); that result is remembered per upload in session state.
+    """
+    state_key = None
+    if full and getattr(uploaded, "file_id", None):
+        state_key = f"fingerprint_{uploaded.file_id}"
+        if state_key in st.session_state:
+            return st.session_state[state_key]
+
+    # getvalue() returns the upload's bytes without copying; getbuffer() copies
+    data = memoryview(uploaded.getvalue())
+    h = hashlib.sha1(str(len(data)).encode("ascii"))
+    if full:
+        h.update(data)
+    else:
+        h.update(data[:FINGERPRINT_CHUNK])
+        h.update(data[-FINGERPRINT_CHUNK:])
+    fingerprint = h.hexdigest()[:16]
+
+    if state_key is not None:
+        st.session_state[state_key] = fingerprint
+    return fingerprint
+
+
 # ============= LOADING EXPORTS =============
-def extract_zip(uploaded_zip):
-    """Extract uploaded ZIP into a temp directory. Return Path to that directory."""
-    temp_dir = Path(tempfile.mkdtemp(prefix="discord_zip_"))
-    with zipfile.ZipFile(uploaded_zip, "r") as z:
-        z.extractall(temp_dir)
-    return temp_dir
+def json_loads(data: bytes | memoryview):
+    """Parse JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()  # stdlib json does not take buffers
+    return json.loads(data)
+
+
+# Fields of a message / attachment that the viewer reads
+MESSAGE_KEYS = ("author", "content", "created_at")
+ATTACHMENT_KEYS = ("filename", "saved_as", "url", "content_type")
 
 
-def load_zip_export(zip_dir: Path):
+@st.cache_resource(show_spinner=False)
+def simdjson_parser():
     """
-    Expect:
-      zip_dir/
-        messages.json
-        metadata.json (optional)
-        attachments/ (folder of files named by `saved_as`)
+    Return a (parser, lock) pair shared by all reruns and sessions.
+
+    Streamlit re-executes the script in a fresh module on every rerun, so a
+    module-level parser would never be reused. A parser's documents must be
+    released before it parses again, so callers hold the lock meanwhile.
     """
-    messages_path = zip_dir / "messages.json"
-    metadata_path = zip_dir / "metadata.json"
-    attachments_path = zip_dir / "attachments"
+    return simdjson.Parser(), threading.Lock()
+
 
-    if not messages_path.exists():
-        return None, None, None
+def simdjson_plain(value):
+    """Convert a simdjson proxy (if it is one) into plain Python objects."""
+    if isinstance(value, simdjson.Object):
+        return value.as_dict()
+    if isinstance(value, simdjson.Array):
+        return value.as_list()
+    return value
 
-    with messages_path.open("r", encoding="utf-8") as f:
-        messages = json.load(f)
+
+def simdjson_messages(doc) -> list:
+    """
+    Build message dicts from a simdjson document, copying only the keys in
+    MESSAGE_KEYS / ATTACHMENT_KEYS (embeds, reactions etc. are never built).
+    """
+    if isinstance(doc, simdjson.Object):
+        doc = doc.get("messages") or []
+
+    messages = []
+    for msg in doc:
+        if not isinstance(msg, simdjson.Object):
+            messages.append(simdjson_plain(msg))
+            continue
+        out = {key: simdjson_plain(msg[key]) for key in MESSAGE_KEYS if key in msg}
+        atts = msg.get("attachments")
+        if isinstance(atts, simdjson.Array):
+            atts = [
+                {key: simdjson_plain(att[key]) for key in ATTACHMENT_KEYS if key in att}
+                if isinstance(att, simdjson.Object)
+                else simdjson_plain(att)
+                for att in atts
+            ]
+        else:
+            atts = simdjson_plain(atts)  # no proxy may outlive the parse
+        if atts is not None:
+            out["attachments"] = atts
+        messages.append(out)
+    return messages
+
+
+def parse_messages(data: bytes | memoryview) -> list:
+    """
+    Parse a whole messages.json buffer into a list of message dicts.
+
+    Supports {"messages": [...]} and plain list. Uses json_loads (orjson is
+    fastest); without orjson, simdjson is used when it is installed.
+    """
+    if orjson is None and simdjson is not None:
+        parser, lock = simdjson_parser()
+        with lock:
+            return simdjson_messages(parser.parse(data))
+
+    data = json_loads(data)
+    if isinstance(data, dict):
+        data = data.get("messages") or []
+    return data
+
+
+def iter_messages(fp, size: int | None = None):
+    """
+    Yield message dicts one at a time from a binary messages.json stream.
+
+    Supports {"messages": [...]} and plain list. Files are parsed in one go
+    (see parse_messages); very large files are parsed incrementally with
+    ijson when it is installed, so the raw JSON text is never held in memory
+    in full. Pass `size` when the stream is expensive to seek to the end
+    (e.g. a ZIP member).
+    """
+    start = fp.tell()
+    if size is None:
+        size = fp.seek(0, os.SEEK_END) - start
+        fp.seek(start)
+
+    if ijson is None or size < STREAM_PARSE_MIN_SIZE:
+        if isinstance(fp, io.BytesIO):
+            # getvalue() shares the upload's bytes; getbuffer() would copy them
+            data = fp.getvalue()
+            messages = parse_messages(memoryview(data)[start:] if start else data)
+        else:
+            messages = parse_messages(fp.read())
+        yield from messages
+        return
+
+    # Peek at the first non-whitespace byte to pick the ijson prefix
+    head = b""
+    while True:
+        chunk = fp.read(64)
+        head = chunk.lstrip()
+        if head or not chunk:
+            break
+    fp.seek(start)
+
+    prefix = "messages.item" if head[:1] == b"{" else "item"
+    yield from ijson.items(fp, prefix)
+
+
+def attachment_content_type(att) -> str:
+    """Return the attachment's content type as a lowercase string."""
+    content_type = att.get("content_type") or ""
+    if not isinstance(content_type, str):
+        content_type = str(content_type)
+    return content_type.lower()
+
+
+def is_static_media(saved_as, content_type: str) -> bool:
+    """Return True if an attachment may be served from app/static (see STATIC_MEDIA_TYPES)."""
+    if not isinstance(saved_as, str):
+        return False
+    media_type = STATIC_MEDIA_TYPES.get(os.path.splitext(saved_as)[1].lower())
+    return media_type is not None and media_type == content_type.split(";", 1)[0].strip()
+
+
+def media_attachments(messages) -> dict[str, str]:
+    """Return {saved_as: content_type} for the image/video attachments of messages."""
+    media = {}
+    for msg in messages:
+        for att in msg.get("attachments") or []:
+            content_type = attachment_content_type(att)
+            if content_type.startswith(("image/", "video/")):
+                saved_as = att.get("saved_as") or att.get("filename", "attachment")
+                media[saved_as] = content_type
+    return media
+
+
+def extract_member(z: zipfile.ZipFile, info: zipfile.ZipInfo, target_dir: Path):
+    """Copy one ZIP member below target_dir with a large buffer."""
+    target = (target_dir / info.filename).resolve()
+    if not target.is_relative_to(target_dir.resolve()):
+        return  # Skip absolute / "../" member names
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with z.open(info) as src, target.open("wb") as dst:
+        shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=CACHE_MAX_UPLOADS, show_spinner=False)
+def open_zip(fingerprint: str, _uploaded_zip) -> zipfile.ZipFile:
+    """
+    Open the uploaded ZIP once per upload fingerprint.
+
+    The handle is kept across reruns (and shared by sessions viewing the
+    same upload), so the central directory is only parsed once and members
+    are read straight from the in-memory upload. At most CACHE_MAX_UPLOADS
+    uploads stay pinned, each for up to CACHE_TTL seconds.
+    """
+    return zipfile.ZipFile(_uploaded_zip, "r")
+
+
+def load_zip_export(z: zipfile.ZipFile):
+    """
+    Read messages and metadata straight from the opened ZIP. Expect:
+      messages.json
+      metadata.json (optional)
+      attachments/ (folder of files named by `saved_as`)
+    """
+    try:
+        info = z.getinfo("messages.json")
+    except KeyError:
+        return None, None
+
+    with z.open(info) as f:
+        messages = list(iter_messages(f, info.file_size))
 
     metadata = None
-    if metadata_path.exists():
+    try:
+        metadata = json_loads(z.read("metadata.json"))
+    except Exception:
+        metadata = None
+
+    return messages, metadata
+
+
+def export_static_dir(fingerprint: str) -> Path:
+    """Return the STATIC_DIR folder that holds files served for one upload."""
+    return STATIC_DIR / f"discord_{fingerprint}"
+
+
+def remove_stale_exports():
+    """Delete exports and temp folders in STATIC_DIR unused for STATIC_EXPORT_TTL seconds."""
+    cutoff = time.time() - STATIC_EXPORT_TTL
+    try:
+        with os.scandir(STATIC_DIR) as it:
+            stale = [
+                entry.path
+                for entry in it
+                if entry.name.startswith(("discord_", ".discord_zip_"))
+                and entry.is_dir(follow_symlinks=False)
+                and entry.stat(follow_symlinks=False).st_mtime < cutoff
+            ]
+    except FileNotFoundError:
+        return
+    for path in stale:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def extract_attachments(z: zipfile.ZipFile, fingerprint: str, messages) -> Path | None:
+    """
+    Extract the videos and images of INLINE_MAX_SIZE or more that pass
+    is_static_media into STATIC_DIR/discord_<fingerprint>/attachments.
+    Return that directory (or None); an existing extraction is reused.
+    """
+    export_dir = export_static_dir(fingerprint)
+    try:
+        os.utime(export_dir)  # mark as in use for remove_stale_exports
+    except FileNotFoundError:
+        remove_stale_exports()
+        # Extract next to the target and rename, so a half-written export is never reused
+        STATIC_DIR.mkdir(exist_ok=True)
+        temp_dir = Path(tempfile.mkdtemp(prefix=".discord_zip_", dir=STATIC_DIR))
+        for saved_as, content_type in media_attachments(messages).items():
+            if not is_static_media(saved_as, content_type):
+                continue
+            try:
+                info = z.getinfo(f"attachments/{saved_as}")
+            except KeyError:
+                continue
+            if info.file_size >= INLINE_MAX_SIZE or content_type.startswith("video/"):
+                extract_member(z, info, temp_dir)
         try:
-            with metadata_path.open("r", encoding="utf-8") as f:
-                metadata = json.load(f)
-        except Exception:
-            metadata = None
+            temp_dir.rename(export_dir)
+        except OSError:
+            # Another session finished the same extraction first
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    attachments_dir = export_dir / "attachments"
+    return attachments_dir if attachments_dir.exists() else None
 
-    attachments_dir = attachments_path if attachments_path.exists() else None
 
-    # Support {"messages": [...]} and plain list
-    if isinstance(messages, dict) and "messages" in messages:
-        messages = messages["messages"]
+def scan_attachments(attachments_dir: Path | None) -> dict[str, os.DirEntry]:
+    """
+    Return {saved_as: DirEntry} for the files below attachments_dir.
 
-    return messages, metadata, attachments_dir
+    Keys are "/"-separated paths relative to attachments_dir, so nested
+    `saved_as` names are found too. Only STATIC_MEDIA_TYPES files are listed.
+    """
+    files = {}
+    if attachments_dir is None:
+        return files
+    pending = [(attachments_dir, "")]
+    while pending:
+        directory, prefix = pending.pop()
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append((entry.path, f"{prefix}{entry.name}/"))
+                elif (
+                    os.path.splitext(entry.name)[1].lower() in STATIC_MEDIA_TYPES
+                    and entry.is_file(follow_symlinks=False)
+                ):
+                    files[prefix + entry.name] = entry
+    return files
 
 
 def load_json(uploaded_json):
     """Load messages from a standalone messages.json file."""
-    data = json.load(uploaded_json)
-    if isinstance(data, dict) and "messages" in data:
-        return data["messages"]
-    return data
+    return list(iter_messages(uploaded_json))
+
+
+def message_sort_key(msg) -> str:
+    """Return a message's created_at string, or "" if it has none."""
+    ts = msg.get("created_at")
+    return ts if isinstance(ts, str) else ""
+
+
+def sort_messages(messages):
+    """
+    Sort messages by timestamp in place.
+
+    Discord's fixed-width ISO-8601 timestamps sort chronologically as plain
+    strings, so no datetime is built; missing or non-string timestamps sort
+    first.
+    """
+    messages.sort(key=message_sort_key)
+
+
+# Parsed exports are cached as resources: reruns get the same (read-only)
+# list back instead of re-parsing or unpickling a copy of every message.
+@st.cache_resource(ttl=CACHE_TTL, max_entries=CACHE_MAX_UPLOADS, show_spinner=False)
+def cached_zip_export(fingerprint: str, _z):
+    """load_zip_export + sort_messages, once per upload fingerprint."""
+    messages, metadata = load_zip_export(_z)
+    if messages:
+        sort_messages(messages)
+    return messages, metadata
+
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=CACHE_MAX_UPLOADS, show_spinner=False)
+def cached_json_export(fingerprint: str, _uploaded_json):
+    """load_json + sort_messages, once per upload fingerprint."""
+    messages = load_json(_uploaded_json)
+    if messages:
+        sort_messages(messages)
+    return messages
 
 
 # ============= RENDERING ATTACHMENTS =============
-def render_attachment(att, attachments_dir: Path | None) -> str:
+def data_uri(data: bytes, mime: str) -> str:
+    """Return `data` as a base64 data URI."""
+    b64 = base64.b64encode(data).decode("ascii")
+    return f"data:{mime};base64,{b64}"
+
+
+def thumbnail_bytes(data: bytes) -> bytes | None:
     """
-    Return HTML snippet for a single attachment.
+    Downscale an image to THUMBNAIL_SIZE and re-encode it as WebP.
 
-    - If ZIP + attachments_dir is available and file is found:
+    Return None on failure, for animated images (the full file keeps the
+    animation) and for images over THUMBNAIL_MAX_PIXELS.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+            if width * height > THUMBNAIL_MAX_PIXELS or getattr(img, "is_animated", False):
+                return None
+            if img.mode in ("1", "P"):
+                img = img.convert("RGBA")  # resize() of these modes is nearest-neighbour
+            # Downscale before anything else decodes the image (lets JPEG use draft mode)
+            img.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA")
+            buf = io.BytesIO()
+            img.save(buf, "WEBP", quality=THUMBNAIL_QUALITY)
+    except Exception:
+        return None
+    return buf.getvalue()
+
+
+def write_thumbnail(data: bytes, target: Path) -> bool:
+    """Write a WebP thumbnail of image `data` to target. Return False if it can't be made."""
+    thumb = thumbnail_bytes(data)
+    if thumb is None:
+        return False
+    # Write under a unique name and rename, so a half-written file is never served
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".thumb_", dir=target.parent)
+    with os.fdopen(fd, "wb") as f:
+        f.write(thumb)
+    os.replace(temp_path, target)
+    return True
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=16, show_spinner=False)
+def attachment_preview_srcs(
+    fingerprint: str, window: tuple[int, int], _z, _messages
+) -> dict[str, str]:
+    """
+    Return {saved_as: <img> src} for the images of one page of messages
+    (`window` is the page's slice of the sorted export):
+      - images below INLINE_MAX_SIZE as data URIs
+      - larger JPEG/PNG/WebP images as URLs of WebP thumbnails (needs Pillow)
+    """
+    thumbnails_dir = export_static_dir(fingerprint) / "thumbnails"
+
+    jobs = []
+    for saved_as, content_type in media_attachments(_messages).items():
+        try:
+            info = _z.getinfo(f"attachments/{saved_as}")
+        except KeyError:
+            continue
+        if not content_type.startswith("image/"):
+            continue
+        if info.file_size < INLINE_MAX_SIZE or (
+            Image is not None and content_type in THUMBNAIL_TYPES
+        ):
+            jobs.append((saved_as, info, content_type))
+    if not jobs:
+        return {}
+
+    def encode(job):
+        saved_as, info, content_type = job
+        if info.file_size < INLINE_MAX_SIZE:
+            return data_uri(_z.read(info), content_type)
+        thumb_path = thumbnails_dir / f"{saved_as}.webp"
+        if os.path.relpath(thumb_path, thumbnails_dir).startswith(".."):
+            return None  # "../" in saved_as
+        if not thumb_path.exists() and not write_thumbnail(_z.read(info), thumb_path):
+            return None
+        return static_url(thumb_path)
+
+    with ThreadPoolExecutor(max_workers=PREVIEW_WORKERS) as pool:
+        uris = pool.map(encode, jobs)
+        return {
+            saved_as: uri
+            for (saved_as, _, _), uri in zip(jobs, uris)
+            if uri is not None
+        }
+
+
+def static_url(local_file: str | Path) -> str | None:
+    """Return the app/static/ URL of a file below STATIC_DIR, or None."""
+    rel_path = os.path.relpath(local_file, STATIC_DIR)
+    if rel_path.startswith(".."):
+        return None
+    return f"{STATIC_URL}/{quote(Path(rel_path).as_posix())}"
+
+
+def render_attachment(
+    att, attachment_files: dict, preview_srcs: dict, out: list
+) -> None:
+    """
+    Append the HTML snippet for a single attachment to `out`.
+
+    - If ZIP is available and the file is found:
         * Images => inline <img>
         * Videos => <video controls>
+      Small images are embedded as data URIs and large ones are shown as
+      thumbnails (`preview_srcs`); other files are served by Streamlit's
+      static file server (`attachment_files`). Image links open the
+      full-size file.
     - Otherwise:
         * Show a simple link using the CDN URL (if any)
     """
-    filename = att.get("filename", "attachment")
-    saved_as = att.get("saved_as") or filename
-    url = att.get("url", "")
-    content_type = att.get("content_type") or ""
-    if not isinstance(content_type, str):
-        content_type = str(content_type)
-    content_type = content_type.lower()
-
-    # Try to locate the local file inside /attachments
-    local_file = None
-    if attachments_dir is not None:
-        candidate = attachments_dir / saved_as
-        if candidate.exists():
-            local_file = candidate
+    get = att.get
+    filename = get("filename", "attachment")
+    saved_as = get("saved_as") or filename
+    url = get("url", "")
+    content_type = attachment_content_type(att)
 
     # Determine media type
-    media_type = ""
-    if "/" in content_type:
-        media_type = content_type.split("/", 1)[0]
+    media_type, slash, _ = content_type.partition("/")
+    if not slash:
+        media_type = ""
 
-    # Choose src: prefer local base64 (for images/videos), fallback to URL
+    # Choose src: prefer the local copy (for images/videos), fallback to URL
     src = None
-    if local_file is not None and media_type in ("image", "video"):
-        try:
-            data = local_file.read_bytes()
-            b64 = base64.b64encode(data).decode("ascii")
-            src = f"data:{content_type};base64,{b64}"
-        except Exception:
-            src = None
+    local_url = None
+    if media_type in ("image", "video"):
+        entry = attachment_files.get(saved_as)
+        if entry is not None:
+            local_url = static_url(entry.path)
+        src = preview_srcs.get(saved_as) or local_url
 
     if src is None and url:
         src = url
 
     # Image preview
     if media_type == "image" and src:
-        return (
+        out.append(
             '<div class="attachment">'
             '<span class="attachment-label">Image:</span>'
-            f'<a href="{html_escape(url or src)}" target="_blank">'
-            f'<img src="{html_escape(src)}" class="attachment-image" alt="{html_escape(filename)}">'
+            f'<a href="{html_escape(url or local_url or src)}" target="_blank">'
+            f'<img src="{html_escape(src)}" class="attachment-image" alt="{html_escape(filename)}" '
+            'loading="lazy" decoding="async">'
             '</a>'
             '</div>'
         )
+        return
 
     # Video preview
     if media_type == "video" and src:
-        return (
+        out.append(
             '<div class="attachment">'
             '<span class="attachment-label">Video:</span>'
-            f'<video controls class="attachment-video" src="{html_escape(src)}"></video>'
+            f'<video controls preload="metadata" class="attachment-video" src="{html_escape(src)}"></video>'
             '</div>'
         )
+        return
 
     # Other files → just a link (or plain filename)
     if url:
-        return (
+        out.append(
             '<div class="attachment">'
             '<span class="attachment-label">Attachment:</span>'
             f'<a href="{html_escape(url)}" target="_blank" class="attachment-link">'
             f'{html_escape(filename)}</a>'
             '</div>'
         )
+        return
 
-    return (
+    out.append(
         '<div class="attachment">'
         '<span class="attachment-label">Attachment:</span>'
         f'<span class="attachment-filename">{html_escape(filename)}</span>'
@@ -172,25 +658,22 @@ def render_attachment(att, attachments_dir: Path | None) -> str:
 
 
 # ============= RENDERING MESSAGES =============
-def render_message(msg, attachments_dir: Path | None) -> str:
-    """Return HTML snippet for a single Discord message row."""
-    author = msg.get("author", "Unknown")
-    content = msg.get("content", "")
-    created_at = msg.get("created_at", "")
+def render_message(
+    msg, attachment_files: dict, preview_srcs: dict, out: list
+) -> None:
+    """Append the HTML snippet for a single Discord message row to `out`."""
+    get = msg.get
+    author = get("author", "Unknown")
+    content = get("content", "")
+    created_at = get("created_at", "")
 
-    dt = parse_ts(created_at)
-    # 12-hour format with AM/PM
-    timestamp = dt.strftime("%Y-%m-%d %I:%M %p") if dt else ""
+    timestamp = format_ts(created_at)
 
     avatar_letter = (author[:1] or "?").upper()
 
     body = html_escape(content)
-    attachments_html = "".join(
-        render_attachment(att, attachments_dir)
-        for att in (msg.get("attachments") or [])
-    )
 
-    return (
+    out.append(
         '<div class="message">'
         f'<div class="avatar">{html_escape(avatar_letter)}</div>'
         '<div class="message-content">'
@@ -199,10 +682,32 @@ def render_message(msg, attachments_dir: Path | None) -> str:
         f'<span class="timestamp">{html_escape(timestamp)}</span>'
         '</div>'
         f'<div class="message-body">{body}</div>'
-        f'{attachments_html}'
-        '</div>'
-        '</div>'
     )
+    attachments = get("attachments")
+    if attachments:
+        for att in attachments:
+            render_attachment(att, attachment_files, preview_srcs, out)
+    out.append("</div></div>")
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=16, show_spinner=False)
+def build_messages_html(
+    fingerprint: str,
+    attachment_count: int,
+    window: tuple[int, int],
+    _messages,
+    _attachment_files,
+    _preview_srcs,
+) -> str:
+    """
+    Return the scrollable preview window HTML for `_messages`, the page at
+    `window` (start/end index). Cached on fingerprint, attachment_count and window.
+    """
+    parts = ['<div class="discord-window"><div class="discord-container">']
+    for m in _messages:
+        render_message(m, _attachment_files, _preview_srcs, parts)
+    parts.append("</div></div>")
+    return "".join(parts)
 
 
 # ============= CSS =============
@@ -335,6 +840,9 @@ def main():
     messages = None
     metadata = None
     attachments_dir = None
+    preview_srcs = {}
+    fingerprint = None
+    z = None
 
     # ZIP has priority if present and within limit
     if zip_file is not None:
@@ -346,12 +854,17 @@ def main():
             )
         else:
             st.success("ZIP uploaded → reading full export (with attachments)…")
-            extracted_dir = extract_zip(zip_file)
-            messages, metadata, attachments_dir = load_zip_export(extracted_dir)
+            fingerprint = upload_fingerprint(zip_file)
+            z = open_zip(fingerprint, zip_file)
+            messages, metadata = cached_zip_export(fingerprint, z)
+            if messages:
+                # Extract first: it skips uploads whose static folder exists
+                attachments_dir = extract_attachments(z, fingerprint, messages)
 
     elif json_file is not None:
         st.success("JSON uploaded → reading messages only (no local attachments)…")
-        messages = load_json(json_file)
+        fingerprint = upload_fingerprint(json_file, full=True)
+        messages = cached_json_export(fingerprint, json_file)
 
     else:
         st.info("Please upload either `messages.json` or an export ZIP to begin.")
@@ -361,22 +874,41 @@ def main():
         st.error("No messages found in the provided file.")
         return
 
-    # Sort by timestamp
-    def sort_key(msg):
-        dt = parse_ts(msg.get("created_at", ""))
-        return dt or datetime.min
-
-    messages = sorted(messages, key=sort_key)
-
     st.subheader(f"Loaded {len(messages)} messages")
 
-    # Build the full HTML once → fewer chances for stray tags to show
-    messages_html = "".join(render_message(m, attachments_dir) for m in messages)
+    attachment_files = scan_attachments(attachments_dir)
+
+    # Only render one page of messages, counted back from the most recent
+    page = 1
+    page_count = -(-len(messages) // PAGE_SIZE)
+    if page_count > 1:
+        page = st.number_input(
+            f"Page (1 = newest, {page_count} = oldest)",
+            min_value=1,
+            max_value=page_count,
+            value=1,
+            step=1,
+            key=f"page_{fingerprint}",  # back to page 1 for a new upload
+        )
+    window_end = len(messages) - (page - 1) * PAGE_SIZE
+    window_start = max(0, window_end - PAGE_SIZE)
+    if page_count > 1:
+        st.caption(f"Showing messages {window_start + 1}–{window_end} of {len(messages)}.")
+    page_messages = messages[window_start:window_end]
+
+    if z is not None:
+        preview_srcs = attachment_preview_srcs(
+            fingerprint, (window_start, window_end), z, page_messages
+        )
 
-    container_html = (
-        '<div class="discord-window"><div class="discord-container">'
-        f"{messages_html}"
-        "</div></div>"
+    # Build the full HTML once → fewer chances for stray tags to show
+    container_html = build_messages_html(
+        fingerprint,
+        len(attachment_files),
+        (window_start, window_end),
+        page_messages,
+        attachment_files,
+        preview_srcs,
     )
 
     st.markdown(container_html, unsafe_allow_html=True)
@@ -0,0 +1,32 @@
+import pytest
+
+import app
+
+simdjson = pytest.importorskip("simdjson")
+
+
+@pytest.fixture
+def simdjson_only(monkeypatch):
+    """Force parse_messages onto the simdjson path."""
+    monkeypatch.setattr(app, "orjson", None)
+
+
+def test_simdjson_keeps_only_viewer_keys(simdjson_only):
+    data = (
+        b'[{"author": "a", "content": "hi", "embeds": [{}],'
+        b' "attachments": [{"filename": "x.png", "size": 1}]}]'
+    )
+    assert app.parse_messages(data) == [
+        {"author": "a", "content": "hi", "attachments": [{"filename": "x.png"}]}
+    ]
+
+
+def test_simdjson_object_attachments_do_not_pin_the_parser(simdjson_only):
+    messages = app.parse_messages(b'[{"attachments": {"x": 1}}]')
+    assert messages == [{"attachments": {"x": 1}}]
+    assert not isinstance(messages[0]["attachments"], simdjson.Object)
+
+    # The shared parser must still be reusable for the next upload
+    assert app.parse_messages(b'{"messages": [{"content": "next"}]}') == [
+        {"content": "next"}
+    ]